@@ -0,0 +1,158 @@
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from typing import Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per route class limits. Cheap endpoints get their own generous pool so a
+# burst of regex searches can never starve the health check or autocomplete.
+ROUTE_LIMITS = {
+    "cheap": {"concurrency": 50, "max_queue": 200, "timeout": 2.0},
+    "default": {"concurrency": 20, "max_queue": 100, "timeout": 5.0},
+    "search": {"concurrency": 8, "max_queue": 32, "timeout": 3.0},
+    "sync": {"concurrency": 4, "max_queue": 32, "timeout": 5.0},
+    "admin": {"concurrency": 2, "max_queue": 10, "timeout": 30.0},
+}
+# Shared cap on everything except cheap routes, which bypass it and so keep
+# priority when the expensive classes together saturate the database. Its
+# wait counts against the route class deadline, so it has no timeout of its own.
+GLOBAL_LIMIT = {"concurrency": 24, "max_queue": 64, "timeout": None}
+CHEAP_PATHS = {"/", "/categories/", "/terms/suggestions"}
+# Full-collection reads: first-time syncs and the initial bundle build
+SYNC_PATHS = {"/terms/changes", "/bundle/manifest"}
+RETRY_AFTER_SECONDS = 2
+
+QUEUE_FULL = "queue full"
+TIMEOUT = "timeout"
+
+class Overloaded(Exception):
+    def __init__(self, limiter: str, reason: str):
+        super().__init__(f"{limiter}: {reason}")
+        self.limiter = limiter
+        self.reason = reason
+
+class RouteLimiter:
+    """Concurrency limit with a bounded wait queue and queue-time metrics"""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, timeout: Optional[float]):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+
+    def deadline(self) -> float:
+        """Event loop time by which a request of this class must be admitted"""
+        return asyncio.get_running_loop().time() + self.timeout
+
+    async def acquire(self, deadline: Optional[float] = None) -> float:
+        """Wait for a slot and return the time spent queued in milliseconds"""
+        # Decide on synchronous counters so a same-tick burst can't overshoot
+        if self.in_flight + self.waiting >= self.concurrency + self.max_queue:
+            self.rejected_queue_full += 1
+            raise Overloaded(self.name, QUEUE_FULL)
+
+        start_time = time.perf_counter()
+        self.waiting += 1
+        try:
+            # Runs inline, unlike wait_for, so a free slot is taken this tick
+            async with asyncio.timeout_at(deadline if deadline is not None else self.deadline()):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            self.rejected_timeout += 1
+            raise Overloaded(self.name, TIMEOUT)
+        finally:
+            self.waiting -= 1
+
+        queue_ms = (time.perf_counter() - start_time) * 1000
+        self.in_flight += 1
+        self.admitted += 1
+        self.total_queue_ms += queue_ms
+        self.max_queue_ms = max(self.max_queue_ms, queue_ms)
+        return queue_ms
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_queue_ms": round(self.total_queue_ms / self.admitted, 2) if self.admitted else 0.0,
+            "max_queue_ms": round(self.max_queue_ms, 2)
+        }
+
+_limiters = {name: RouteLimiter(name, **limits) for name, limits in ROUTE_LIMITS.items()}
+_global_limiter = RouteLimiter("global", **GLOBAL_LIMIT)
+
+def classify(request: Request) -> str:
+    path = request.url.path
+    if path in SYNC_PATHS:
+        return "sync"
+    if path in CHEAP_PATHS or path.startswith("/bundle/"):
+        return "cheap"
+    if path.startswith("/admin/"):
+        return "admin"
+    if path == "/terms/" and request.method == "GET" and request.query_params.get("search"):
+        return "search"
+    return "default"
+
+async def admission_middleware(request: Request, call_next):
+    """Admit requests per route class, shedding load with a fast 503"""
+    if request.method == "OPTIONS":
+        return await call_next(request)
+
+    limiters = [_limiters[classify(request)]]
+    if limiters[0].name != "cheap":
+        limiters.append(_global_limiter)
+
+    # One deadline across the class and global waits
+    deadline = limiters[0].deadline()
+    queue_ms = 0.0
+    acquired = []
+    try:
+        for limiter in limiters:
+            queue_ms += await limiter.acquire(deadline)
+            acquired.append(limiter)
+    except Overloaded as e:
+        for held in acquired:
+            held.release()
+        logger.warning(f"Shedding {request.url.path}: {e.limiter} {e.reason}")
+        return JSONResponse(
+            status_code=503,
+            content={
+                "detail": "Server is busy, please retry shortly",
+                "status_code": 503,
+                "type": "error"
+            },
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+    try:
+        response = await call_next(request)
+    finally:
+        for held in acquired:
+            held.release()
+    response.headers["X-Queue-Time"] = f"{queue_ms:.2f}"
+    return response
+
+def get_admission_stats():
+    stats = {name: limiter.stats() for name, limiter in _limiters.items()}
+    stats["global"] = _global_limiter.stats()
+    return stats
@@ -7,10 +7,6 @@ from dotenv import load_dotenv
 # Load the .env file
 load_dotenv()
 
-# Print the values (for debugging)
-print("Username:", os.getenv("ADMIN_USERNAME"))
-print("Password:", os.getenv("ADMIN_PASSWORD"))
-
 security = HTTPBasic()
 
 def get_admin_credentials(credentials: HTTPBasicCredentials = Depends(security)):
@@ -0,0 +1,169 @@
+from . import database
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import re
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Bump when the bundle layout changes so clients can reject unknown formats
+BUNDLE_VERSION = 1
+PREFIX_LENGTH = 4
+REBUILD_DELAY_SECONDS = 5
+# Level 9 costs several times more CPU for a few percent smaller output
+COMPRESS_LEVEL = 6
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_token_pattern = re.compile(r"[a-z0-9]+")
+
+# Current bundle kept in memory; the previous one stays servable so clients
+# that fetched the old manifest just before a rebuild don't get a 404
+_bundle = {
+    "current": None,
+    "previous": None,
+    "last_build_ms": None,
+    "built_version": None
+}
+_rebuild_lock = asyncio.Lock()
+_rebuild_task = None
+_build_task = None
+# Bumped by every write so delayed rebuilds can tell if the bundle is stale
+_write_version = 0
+
+def _tokenize(text: str):
+    return _token_pattern.findall(text.lower())
+
+def build_index(terms: list):
+    """Build token and term-prefix postings lists keyed by term position"""
+    tokens = {}
+    prefixes = {}
+    for position, term in enumerate(terms):
+        words = set(_tokenize(f"{term['term']} {term['definition']} {term['category']}"))
+        for word in words:
+            tokens.setdefault(word, []).append(position)
+
+        name = term['term'].lower()
+        for length in range(1, min(len(name), PREFIX_LENGTH) + 1):
+            postings = prefixes.setdefault(name[:length], [])
+            if not postings or postings[-1] != position:
+                postings.append(position)
+    return {"tokens": tokens, "prefixes": prefixes}
+
+def _render_bundle(docs: list):
+    """Serialize the corpus and its index; CPU bound, run off the event loop"""
+    terms = [database.fix_id(doc) for doc in docs]
+    payload = {
+        "version": BUNDLE_VERSION,
+        "fields": ["id", "term", "definition", "category"],
+        "terms": [[t['id'], t['term'], t['definition'], t['category']] for t in terms],
+        "categories": sorted({t['category'] for t in terms}),
+        "index": build_index(terms)
+    }
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()
+    return raw, hashlib.sha256(raw).hexdigest()[:16]
+
+async def generate_bundle():
+    """Build the corpus bundle and swap it in as the current one"""
+    async with _rebuild_lock:
+        start_time = time.perf_counter()
+        version = _write_version
+        docs = await database.db.terms.find(
+            {}, {'term': 1, 'definition': 1, 'category': 1}
+        ).sort('term', 1).to_list(length=None)
+        raw, content_hash = await asyncio.to_thread(_render_bundle, docs)
+
+        current = _bundle["current"]
+        if current and current["hash"] == content_hash:
+            _bundle["built_version"] = version
+            logger.info("Corpus bundle unchanged, keeping current bundle")
+            return current
+
+        # mtime=0 keeps the compressed bytes stable for identical content
+        body = await asyncio.to_thread(gzip.compress, raw, COMPRESS_LEVEL, mtime=0)
+        bundle = {
+            "name": f"corpus-v{BUNDLE_VERSION}-{content_hash}.json",
+            "hash": content_hash,
+            "version": BUNDLE_VERSION,
+            "term_count": len(docs),
+            "size_bytes": len(raw),
+            "compressed_size_bytes": len(body),
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "body": body
+        }
+        _bundle["previous"] = current
+        _bundle["current"] = bundle
+        _bundle["built_version"] = version
+        _bundle["last_build_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+        logger.info(
+            f"Generated corpus bundle {bundle['name']} "
+            f"({bundle['compressed_size_bytes']} bytes, {_bundle['last_build_ms']}ms)"
+        )
+        return bundle
+
+async def _delayed_rebuild():
+    global _rebuild_task
+    try:
+        await asyncio.sleep(REBUILD_DELAY_SECONDS)
+        _rebuild_task = None
+        # Another caller already built from the latest writes
+        if _bundle["current"] and _bundle["built_version"] == _write_version:
+            return
+        await generate_bundle()
+    except Exception as e:
+        logger.error(f"Corpus bundle rebuild failed: {e}")
+
+async def ensure_bundle():
+    """Return the current bundle, sharing one initial build across callers"""
+    global _build_task
+    if _bundle["current"]:
+        return _bundle["current"]
+    if _build_task is None or _build_task.done():
+        _build_task = asyncio.create_task(generate_bundle())
+    # Shield so a disconnecting client doesn't cancel everyone else's build
+    return await asyncio.shield(_build_task)
+
+def schedule_rebuild(after_write: bool = True):
+    """Regenerate the bundle shortly after writes, coalescing bursts of edits"""
+    global _rebuild_task, _write_version
+    if after_write:
+        _write_version += 1
+    if _rebuild_task is None or _rebuild_task.done():
+        _rebuild_task = asyncio.create_task(_delayed_rebuild())
+
+def get_bundle(name: str):
+    for key in ("current", "previous"):
+        bundle = _bundle[key]
+        if bundle and bundle["name"] == name:
+            return bundle
+    return None
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows a gzip response body"""
+    codings = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.partition(';')
+        codings[coding.strip()] = params.replace(' ', '').rstrip('0').rstrip('.') not in ('q=', 'q=0')
+    # An explicit gzip entry takes precedence over the wildcard
+    if 'gzip' in codings:
+        return codings['gzip']
+    return codings.get('*', False)
+
+def get_manifest():
+    bundle = _bundle["current"]
+    if not bundle:
+        return None
+    return {key: value for key, value in bundle.items() if key != "body"}
+
+def get_bundle_stats():
+    manifest = get_manifest()
+    if not manifest:
+        return {"available": False}
+    return {
+        "available": True,
+        **manifest,
+        "last_build_ms": _bundle["last_build_ms"]
+    }
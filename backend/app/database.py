@@ -1,6 +1,8 @@
 import os
+import hashlib
 import motor.motor_asyncio
 from bson import ObjectId
+from pymongo import InsertOne, UpdateOne, ReturnDocument
 from typing import Optional
 from fastapi import HTTPException
 import logging
@@ -11,27 +13,40 @@ from . import models_mongo
 # Initialize logger
 logger = logging.getLogger(__name__)
 
-# Get MongoDB URL from environment variable
-MONGODB_URL = os.getenv("MONGODB_URL")
-if not MONGODB_URL:
-    raise ValueError(
-        "No MongoDB URL found. "
-        "Make sure MONGODB_URL environment variable is set"
-    )
+_client = None
+
+def get_client():
+    """Create the Motor client on first use instead of at import time"""
+    global _client
+    if _client is None:
+        # Get MongoDB URL from environment variable
+        mongodb_url = os.getenv("MONGODB_URL")
+        if not mongodb_url:
+            raise ValueError(
+                "No MongoDB URL found. "
+                "Make sure MONGODB_URL environment variable is set"
+            )
+
+        # Create Motor client with connection pooling and timeouts
+        _client = motor.motor_asyncio.AsyncIOMotorClient(
+            mongodb_url,
+            serverSelectionTimeoutMS=5000,
+            connectTimeoutMS=10000
+        )
+    return _client
 
-# Create Motor client with connection pooling and timeouts
-client = motor.motor_asyncio.AsyncIOMotorClient(
-    MONGODB_URL,
-    serverSelectionTimeoutMS=5000,
-    connectTimeoutMS=10000
-)
+class _LazyDatabase:
+    """Resolves collections against the feddict database once it is first used"""
 
-db = client.feddict  # Add this line to define the database
+    def __getattr__(self, name):
+        return getattr(get_client().feddict, name)
+
+db = _LazyDatabase()
 
 # Verify database connection on startup
 async def verify_database():
     try:
-        await client.admin.command('ping')
+        await get_client().admin.command('ping')
         logger.info("Successfully connected to MongoDB")
     except Exception as e:
         logger.error(f"Could not connect to MongoDB: {e}")
@@ -44,6 +59,142 @@ def fix_id(obj):
         del obj['_id']
     return obj
 
+# Change tracking: every write stamps documents with updated_at, deletes
+# leave a tombstone in term_tombstones. The feed orders changes by
+# (updated_at, _id) and holds back the most recent CHANGE_FEED_LAG, so a write
+# stamped just before a client reads but committed just after is still
+# delivered. Bulk writes are stamped per chunk so each chunk commits well
+# within the lag window.
+CHANGE_FEED_LAG = timedelta(seconds=15)
+BULK_WRITE_CHUNK_SIZE = 1000
+TOMBSTONE_RETENTION = timedelta(days=30)
+CHANGE_TRACKING_VERSION = 2
+_EPOCH = datetime(1970, 1, 1)
+
+def _change_stamp() -> dict:
+    return {'updated_at': datetime.utcnow()}
+
+def _to_millis(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+def _from_millis(value: int) -> datetime:
+    return _EPOCH + timedelta(milliseconds=value)
+
+def make_sync_token(updated_at: datetime, oid: ObjectId) -> str:
+    return f"{_to_millis(updated_at)}.{oid}"
+
+def parse_sync_token(token: str):
+    """Parse a sync token into (updated_at, _id); an empty token means start over"""
+    if not token or token == '0':
+        return None
+    millis, _, oid = token.partition('.')
+    return _from_millis(int(millis)), ObjectId(oid)
+
+async def _delete_terms(object_ids: list) -> int:
+    """Delete terms and record tombstones for them"""
+    if not object_ids:
+        return 0
+    result = await db.terms.delete_many({'_id': {'$in': object_ids}})
+    if result.deleted_count:
+        stamp = _change_stamp()
+        # Upserts keep overlapping deletes of the same ids idempotent
+        await db.term_tombstones.bulk_write([
+            UpdateOne({'_id': oid}, {'$set': stamp}, upsert=True)
+            for oid in object_ids
+        ], ordered=False)
+    return result.deleted_count
+
+async def compact_tombstones():
+    """Drop tombstones past retention; older sync tokens must resync"""
+    cutoff = datetime.utcnow() - TOMBSTONE_RETENTION
+    result = await db.term_tombstones.delete_many({'updated_at': {'$lt': cutoff}})
+    if result.deleted_count:
+        await db.sync_state.update_one(
+            {'_id': 'terms'},
+            {'$max': {'compacted_before': cutoff}},
+            upsert=True
+        )
+        logger.info(f"Compacted {result.deleted_count} tombstones")
+    return result.deleted_count
+
+async def ensure_change_tracking():
+    """One-shot index creation and backfill of terms written before tracking"""
+    try:
+        state = await db.sync_state.find_one({'_id': 'terms'}, {'version': 1})
+        if state and state.get('version', 0) >= CHANGE_TRACKING_VERSION:
+            return
+
+        await db.terms.create_index([('updated_at', 1), ('_id', 1)])
+        await db.term_tombstones.create_index([('updated_at', 1), ('_id', 1)])
+        untracked = await db.terms.find(
+            {'updated_at': {'$exists': False}}, {'_id': 1}
+        ).to_list(length=None)
+        for start in range(0, len(untracked), BULK_WRITE_CHUNK_SIZE):
+            stamp = _change_stamp()
+            await db.terms.bulk_write([
+                UpdateOne({'_id': doc['_id']}, {'$set': stamp})
+                for doc in untracked[start:start + BULK_WRITE_CHUNK_SIZE]
+            ], ordered=False)
+        if untracked:
+            logger.info(f"Backfilled updated_at for {len(untracked)} terms")
+
+        await db.sync_state.update_one(
+            {'_id': 'terms'},
+            {'$set': {'version': CHANGE_TRACKING_VERSION}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Error setting up change tracking: {e}")
+        raise
+
+async def get_changes(since: Optional[str] = None, limit: int = 500):
+    """Return terms and tombstones changed after the given sync token"""
+    try:
+        position = parse_sync_token(since)
+        state = await db.sync_state.find_one({'_id': 'terms'}, {'compacted_before': 1}) or {}
+        compacted_before = state.get('compacted_before')
+        # Tombstones the client needs are gone, so it has to start over
+        reset = bool(position and compacted_before and position[0] < compacted_before)
+        if reset:
+            position = None
+
+        cutoff = datetime.utcnow() - CHANGE_FEED_LAG
+        query = {'updated_at': {'$lte': cutoff}}
+        if position:
+            updated_at, oid = position
+            query = {'$and': [query, {'$or': [
+                {'updated_at': {'$gt': updated_at}},
+                {'updated_at': updated_at, '_id': {'$gt': oid}}
+            ]}]}
+
+        sort = [('updated_at', 1), ('_id', 1)]
+        updated = await db.terms.find(query).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+        deleted = await db.term_tombstones.find(query).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+
+        changes = sorted(
+            [('updated', doc) for doc in updated] + [('deleted', doc) for doc in deleted],
+            key=lambda change: (change[1]['updated_at'], change[1]['_id'])
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        if changes:
+            last = changes[-1][1]
+            token = make_sync_token(last['updated_at'], last['_id'])
+        else:
+            token = None if reset else since
+
+        return {
+            'items': [fix_id(doc) for kind, doc in changes if kind == 'updated'],
+            'deleted': [str(doc['_id']) for kind, doc in changes if kind == 'deleted'],
+            'token': token or '0',
+            'has_more': has_more,
+            'reset': reset
+        }
+    except Exception as e:
+        logger.error(f"Error in get_changes: {e}")
+        raise
+
 # Database operations
 async def get_terms(
     skip: int = 0,
@@ -105,7 +256,7 @@ async def create_term(term_data: dict):
     if existing:
         raise HTTPException(status_code=400, detail="Term already exists")
     
-    result = await db.terms.insert_one(term_data)
+    result = await db.terms.insert_one({**term_data, **_change_stamp()})
     created_term = await db.terms.find_one({'_id': result.inserted_id})
     return fix_id(created_term)
 
@@ -114,16 +265,20 @@ async def get_term(term_id: str):
     return fix_id(term) if term else None
 
 async def update_term(term_id: str, term_data: dict):
-    await db.terms.update_one(
+    # Stamp and read back in one round trip
+    updated_term = await db.terms.find_one_and_update(
         {'_id': ObjectId(term_id)},
-        {'$set': term_data}
+        {'$set': {**term_data, **_change_stamp()}},
+        return_document=ReturnDocument.AFTER
     )
-    updated_term = await db.terms.find_one({'_id': ObjectId(term_id)})
     return fix_id(updated_term)
 
 async def delete_term(term_id: str):
-    result = await db.terms.delete_one({'_id': ObjectId(term_id)})
-    return result.deleted_count > 0
+    return await _delete_terms([ObjectId(term_id)]) > 0
+
+async def has_terms() -> bool:
+    """Cheap existence probe that avoids counting the collection"""
+    return await db.terms.find_one({}, {'_id': 1}) is not None
 
 async def get_database_stats():
     try:
@@ -252,7 +407,7 @@ async def bulk_create_terms(terms: list):
                     continue
                 
                 # Create term
-                await db.terms.insert_one(term.model_dump())
+                await db.terms.insert_one({**term.model_dump(), **_change_stamp()})
                 results["success"] += 1
                 
             except Exception as e:
@@ -269,6 +424,274 @@ async def bulk_create_terms(terms: list):
         logger.error(f"Bulk creation error: {e}")
         raise
 
+def _normalize_key(term: str) -> str:
+    """Normalized lookup key used for duplicate detection"""
+    return term.strip().lower()
+
+def _content_hash(term: str, definition: str, category: str) -> str:
+    """Hash of the stored content of a term, including its exact spelling"""
+    return hashlib.sha1(f"{term}\x1f{definition}\x1f{category}".encode()).hexdigest()
+
+async def _build_term_index():
+    """Load the existing corpus once into a dict keyed by normalized term"""
+    cursor = db.terms.find({}, {'term': 1, 'definition': 1, 'category': 1})
+    index = {}
+    async for doc in cursor:
+        index[_normalize_key(doc['term'])] = {
+            '_id': doc['_id'],
+            'term': doc['term'],
+            'hash': _content_hash(doc['term'], doc.get('definition', ''), doc.get('category', ''))
+        }
+    return index
+
+async def _classify_upload_terms(terms: list):
+    """Classify uploaded rows against the existing corpus in a single pass"""
+    index = await _build_term_index()
+    classified = {
+        "new": [],
+        "changed": [],
+        "conflict": [],
+        "invalid": [],
+        "duplicate": 0,
+        "repeated": 0
+    }
+    seen = set()
+    # Normalized keys and acronym base keys of rows already classified as new,
+    # so conflicts between rows of the same file are caught too
+    uploaded = {}
+
+    for term_data in terms:
+        try:
+            term = models_mongo.TermCreate(
+                term=term_data['term'].strip(),
+                definition=term_data['definition'].strip(),
+                category=term_data['category'].strip()
+            )
+        except Exception as e:
+            classified["invalid"].append({
+                "term": term_data.get('term', 'unknown') if isinstance(term_data, dict) else 'unknown',
+                "error": str(e)
+            })
+            continue
+
+        key = _normalize_key(term.term)
+        if key in seen:
+            classified["repeated"] += 1
+            continue
+        seen.add(key)
+
+        existing = index.get(key)
+        if existing:
+            if existing['hash'] == _content_hash(term.term, term.definition, term.category):
+                classified["duplicate"] += 1
+            else:
+                classified["changed"].append({"id": str(existing['_id']), **term.model_dump()})
+            continue
+
+        if key in uploaded:
+            classified["conflict"].append({"term": term.term, "existing": uploaded[key]})
+            continue
+
+        # Also check for full name if it's an acronym
+        base_key = _normalize_key(term.term.split('(')[0]) if '(' in term.term else None
+        if base_key:
+            base_existing = index.get(base_key)
+            if base_existing or base_key in uploaded:
+                classified["conflict"].append({
+                    "term": term.term,
+                    "existing": base_existing['term'] if base_existing else uploaded[base_key]
+                })
+                continue
+
+        classified["new"].append(term.model_dump())
+        uploaded[key] = term.term
+        if base_key:
+            uploaded.setdefault(base_key, term.term)
+
+    return classified
+
+DIFF_SAMPLE_LIMIT = 100
+
+async def diff_upload_terms(terms: list, sample_limit: int = DIFF_SAMPLE_LIMIT):
+    """Compact dry-run diff: counts plus a capped sample of affected terms"""
+    classified = await _classify_upload_terms(terms)
+    lists = ("new", "changed", "conflict", "invalid")
+    return {
+        "summary": {
+            "processed": len(terms),
+            "duplicate": classified["duplicate"],
+            "repeated": classified["repeated"],
+            **{name: len(classified[name]) for name in lists}
+        },
+        "new": [row["term"] for row in classified["new"][:sample_limit]],
+        "changed": [
+            {"id": row["id"], "term": row["term"]}
+            for row in classified["changed"][:sample_limit]
+        ],
+        "conflict": classified["conflict"][:sample_limit],
+        "invalid": classified["invalid"][:sample_limit],
+        "truncated": any(len(classified[name]) > sample_limit for name in lists)
+    }
+
+async def upsert_terms(terms: list):
+    """Insert new rows and update changed rows with chunked bulk_write"""
+    try:
+        diff = await _classify_upload_terms(terms)
+
+        rows = [(None, row) for row in diff["new"]]
+        rows.extend((ObjectId(row['id']), row) for row in diff["changed"])
+
+        inserted = modified = 0
+        for start in range(0, len(rows), BULK_WRITE_CHUNK_SIZE):
+            stamp = _change_stamp()
+            operations = [
+                InsertOne({**row, **stamp}) if oid is None else UpdateOne(
+                    {'_id': oid},
+                    {'$set': {
+                        'term': row['term'],
+                        'definition': row['definition'],
+                        'category': row['category'],
+                        **stamp
+                    }}
+                )
+                for oid, row in rows[start:start + BULK_WRITE_CHUNK_SIZE]
+            ]
+            result = await db.terms.bulk_write(operations, ordered=False)
+            inserted += result.inserted_count
+            modified += result.modified_count
+        if rows:
+            _cache["categories"]["data"] = None
+
+        results = {
+            "processed": len(terms),
+            "inserted": inserted,
+            "updated": modified,
+            "unchanged": diff["duplicate"] + diff["repeated"],
+            "conflicts": diff["conflict"][:DIFF_SAMPLE_LIMIT],
+            "invalid": diff["invalid"][:DIFF_SAMPLE_LIMIT]
+        }
+        logger.info(f"Upsert results: inserted={inserted}, updated={modified}")
+        return results
+    except Exception as e:
+        logger.error(f"Upsert error: {e}")
+        raise
+
+async def _find_rename_collisions(renames: dict) -> dict:
+    """Map term ids to an error for renames clashing with other terms"""
+    collisions = {}
+    by_key = {}
+    for oid, name in renames.items():
+        by_key.setdefault(_normalize_key(name), []).append(oid)
+    for oids in by_key.values():
+        if len(oids) > 1:
+            for oid in oids:
+                collisions[oid] = f"Rename to '{renames[oid]}' conflicts with another update"
+
+    # Case-insensitive match, same as the duplicate check in create_term
+    cursor = db.terms.find(
+        {'term': {'$in': list(renames.values())}},
+        {'term': 1},
+        collation={'locale': 'en', 'strength': 2}
+    )
+    async for doc in cursor:
+        for oid in by_key.get(_normalize_key(doc['term']), []):
+            if oid != doc['_id']:
+                collisions.setdefault(oid, f"Term '{renames[oid]}' already exists")
+    return collisions
+
+async def bulk_update_terms(updates: list, recategorize: list):
+    """Apply partial updates and category reassignments with chunked bulk_write"""
+    try:
+        requested = {}
+        errors = []
+        for update in updates:
+            fields = {
+                key: value for key, value in update.items()
+                if key != 'id' and value is not None
+            }
+            if not fields:
+                continue
+            try:
+                oid = ObjectId(update['id'])
+            except Exception:
+                errors.append(f"Invalid term id '{update['id']}'")
+                continue
+            requested.setdefault(oid, {}).update(fields)
+
+        # One read covers explicit ids and filter-based updates, which are
+        # resolved to ids so only documents that actually change are stamped
+        mapping = {r['from_category']: r['to_category'] for r in recategorize}
+        clauses = []
+        if requested:
+            clauses.append({'_id': {'$in': list(requested)}})
+        if mapping:
+            clauses.append({'category': {'$in': list(mapping)}})
+        current = {}
+        if clauses:
+            cursor = db.terms.find({'$or': clauses}, {'term': 1, 'definition': 1, 'category': 1})
+            async for doc in cursor:
+                current[doc['_id']] = doc
+
+        for oid in requested:
+            if oid not in current:
+                errors.append(f"Term '{oid}' not found")
+        for oid, doc in current.items():
+            if doc.get('category') in mapping:
+                requested.setdefault(oid, {}).setdefault('category', mapping[doc['category']])
+
+        # Only write fields whose value actually changes
+        changes = {}
+        unchanged = 0
+        for oid, fields in requested.items():
+            doc = current.get(oid)
+            if doc is None:
+                continue
+            fields = {key: value for key, value in fields.items() if doc.get(key) != value}
+            if fields:
+                changes[oid] = fields
+            else:
+                unchanged += 1
+
+        renames = {oid: fields['term'] for oid, fields in changes.items() if 'term' in fields}
+        if renames:
+            for oid, error in (await _find_rename_collisions(renames)).items():
+                errors.append(error)
+                del changes[oid]
+
+        matched = modified = 0
+        pending = list(changes.items())
+        for start in range(0, len(pending), BULK_WRITE_CHUNK_SIZE):
+            stamp = _change_stamp()
+            operations = [
+                UpdateOne(
+                    # Skip documents that already hold these values by now
+                    {'_id': oid, '$or': [{key: {'$ne': value}} for key, value in fields.items()]},
+                    {'$set': {**fields, **stamp}}
+                )
+                for oid, fields in pending[start:start + BULK_WRITE_CHUNK_SIZE]
+            ]
+            result = await db.terms.bulk_write(operations, ordered=False)
+            matched += result.matched_count
+            modified += result.modified_count
+        if changes:
+            _cache["categories"]["data"] = None
+
+        updated = await db.terms.find(
+            {'_id': {'$in': list(changes)}}
+        ).to_list(length=None) if changes else []
+
+        logger.info(f"Bulk update results: matched={matched}, modified={modified}")
+        return {
+            "matched": matched,
+            "modified": modified,
+            "unchanged": unchanged,
+            "items": [fix_id(term) for term in updated],
+            "errors": errors
+        }
+    except Exception as e:
+        logger.error(f"Bulk update error: {e}")
+        raise
+
 async def cleanup_duplicates():
     """Remove duplicate terms from the database"""
     try:
@@ -290,8 +713,8 @@ async def cleanup_duplicates():
         
         # Remove duplicates
         if duplicates:
-            result = await db.terms.delete_many({'_id': {'$in': duplicates}})
-            logger.info(f"Removed {result.deleted_count} duplicate terms")
+            deleted = await _delete_terms(duplicates)
+            logger.info(f"Removed {deleted} duplicate terms")
             
         return len(duplicates)
         
@@ -304,8 +727,8 @@ async def bulk_delete_terms(term_ids: list[str]) -> int:
     try:
         # Convert string IDs to ObjectIds
         object_ids = [ObjectId(id) for id in term_ids]
-        result = await db.terms.delete_many({'_id': {'$in': object_ids}})
-        return result.deleted_count
+        existing = await db.terms.distinct('_id', {'_id': {'$in': object_ids}})
+        return await _delete_terms(existing)
     except Exception as e:
         logger.error(f"Bulk delete error: {e}")
         raise
@@ -313,8 +736,8 @@ async def bulk_delete_terms(term_ids: list[str]) -> int:
 async def delete_all_terms() -> int:
     """Delete all terms from the database"""
     try:
-        result = await db.terms.delete_many({})
-        return result.deleted_count
+        existing = await db.terms.distinct('_id')
+        return await _delete_terms(existing)
     except Exception as e:
         logger.error(f"Delete all error: {e}")
         raise 
\ No newline at end of file
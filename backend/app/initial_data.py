@@ -34,8 +34,7 @@ initial_terms = [
 async def init_db():
     try:
         # Check if we already have terms
-        existing = await database.get_terms(0, 1)
-        if existing['total'] == 0:
+        if not await database.has_terms():
             logger.info("Initializing database with default terms")
             for term_data in initial_terms:
                 await database.create_term(term_data)
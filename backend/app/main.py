@@ -1,16 +1,19 @@
+import time
+_import_start = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Request, status, Depends, BackgroundTasks, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from typing import Optional
-from . import database, models_mongo, initial_data
+from . import database, models_mongo, initial_data, bundle, admission
 from .auth import get_admin_credentials
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 import logging
-import time
 import asyncio
 from datetime import datetime
 import csv
+import gzip
 import json
 from io import StringIO
 from pydantic import BaseModel
@@ -31,15 +34,61 @@ async def warm_up_tasks():
         await database.verify_database()
         # Pre-fetch categories for cache
         await database.get_categories()
+        # Drop tombstones past the sync retention window
+        await database.compact_tombstones()
         # Log warm-up success
         logger.info("Warm-up tasks completed successfully")
     except Exception as e:
         logger.error(f"Warm-up failed: {e}")
 
+# Cold start timing report, exposed in /admin/stats
+startup_report = {
+    "import_ms": round((time.perf_counter() - _import_start) * 1000, 2),
+    "startup_ms": None,
+    "phases": {}
+}
+
+async def _timed_phase(name: str, coro):
+    start_time = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        startup_report["phases"][name] = round((time.perf_counter() - start_time) * 1000, 2)
+
+# Keep references so background startup tasks aren't garbage collected
+_background_tasks = set()
+
+async def _background_phase(name: str, coro):
+    try:
+        await _timed_phase(name, coro)
+    except Exception as e:
+        logger.error(f"Background startup task {name} failed: {e}")
+
+def _run_in_background(name: str, coro):
+    task = asyncio.create_task(_background_phase(name, coro))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
 @app.on_event("startup")
 async def startup_event():
-    await database.verify_database()
-    await initial_data.init_db()
+    start_time = time.perf_counter()
+    # Independent checks run concurrently to shorten cold starts; a failing
+    # phase cancels the others so nothing keeps writing after startup aborts
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(_timed_phase("verify_database", database.verify_database()))
+            group.create_task(_timed_phase("init_db", initial_data.init_db()))
+    except ExceptionGroup as e:
+        raise e.exceptions[0]
+    # One-shot index creation and backfill for the change feed
+    _run_in_background("change_tracking", database.ensure_change_tracking())
+    # Build the corpus bundle off the critical path
+    bundle.schedule_rebuild(after_write=False)
+    startup_report["startup_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+    logger.info(f"Startup timing: {startup_report}")
+
+# Admission control sits inside CORS so 503 responses still carry CORS headers
+app.middleware("http")(admission.admission_middleware)
 
 # Configure CORS
 app.add_middleware(
@@ -93,7 +142,9 @@ async def read_root(background_tasks: BackgroundTasks):
             "terms": "/terms/",
             "categories": "/categories/",
             "search": "/terms/?search=your_search_term",
-            "filter": "/terms/?category=your_category"
+            "filter": "/terms/?category=your_category",
+            "changes": "/terms/changes?since=0",
+            "bundle": "/bundle/manifest"
         }
     }
 
@@ -131,7 +182,28 @@ async def create_term(
     term: models_mongo.TermCreate,
     username: str = Depends(get_admin_credentials)
 ):
-    return await database.create_term(term.dict())
+    created = await database.create_term(term.dict())
+    bundle.schedule_rebuild()
+    return created
+
+@app.get("/terms/changes")
+async def get_term_changes(since: str = '0', limit: int = 500):
+    """Get terms changed and deleted since a sync token for client-side replicas"""
+    try:
+        database.parse_sync_token(since)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    if not 1 <= limit <= 5000:
+        raise HTTPException(status_code=400, detail="Invalid limit")
+
+    try:
+        return await database.get_changes(since=since, limit=limit)
+    except Exception as e:
+        logger.error(f"Error in get_term_changes endpoint: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to fetch changes"
+        )
 
 @app.get("/terms/{term_id}", response_model=models_mongo.Term)
 async def get_term(term_id: str):
@@ -149,6 +221,7 @@ async def update_term(
     updated_term = await database.update_term(term_id, term.dict())
     if not updated_term:
         raise HTTPException(status_code=404, detail="Term not found")
+    bundle.schedule_rebuild()
     return updated_term
 
 @app.delete("/terms/{term_id}")
@@ -156,8 +229,51 @@ async def delete_term(term_id: str, username: str = Depends(get_admin_credential
     success = await database.delete_term(term_id)
     if not success:
         raise HTTPException(status_code=404, detail="Term not found")
+    bundle.schedule_rebuild()
     return {"message": "Term deleted successfully"}
 
+@app.get("/bundle/manifest")
+async def get_bundle_manifest():
+    """Describe the current corpus bundle so clients know which file to fetch"""
+    try:
+        await bundle.ensure_bundle()
+    except Exception as e:
+        logger.error(f"Bundle generation error: {e}")
+        raise HTTPException(status_code=503, detail="Corpus bundle not available")
+    manifest = bundle.get_manifest()
+    return JSONResponse(
+        content={**manifest, "url": f"/bundle/{manifest['name']}"},
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.get("/bundle/{name}")
+async def get_bundle(name: str, request: Request):
+    """Serve a content-hash-named corpus bundle with immutable caching"""
+    current = bundle.get_bundle(name)
+    if not current:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+
+    headers = {
+        "Cache-Control": bundle.IMMUTABLE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+        "ETag": f'"{current["hash"]}"'
+    }
+    # Content is immutable per name, so a matching validator is always fresh
+    client_tags = [
+        tag.strip().removeprefix("W/")
+        for tag in request.headers.get("if-none-match", "").split(",")
+    ]
+    if headers["ETag"] in client_tags or "*" in client_tags:
+        return Response(status_code=304, headers=headers)
+
+    body = current["body"]
+    if bundle.accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        # Rare for browsers; decompress on demand rather than keep two copies
+        body = gzip.decompress(body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/categories/")
 async def get_categories():
     return await database.get_categories()
@@ -172,16 +288,31 @@ async def get_stats(username: str = Depends(get_admin_credentials)):
     stats = await database.get_database_stats()
     if not stats:
         raise HTTPException(status_code=500, detail="Failed to get database stats")
+    stats["bundle"] = bundle.get_bundle_stats()
+    stats["admission"] = admission.get_admission_stats()
+    stats["startup"] = startup_report
     return stats
 
 @app.post("/admin/upload")
 async def upload_terms(
     file: UploadFile = File(...),
+    dry_run: bool = False,
+    mode: str = 'insert',
     background_tasks: BackgroundTasks = BackgroundTasks(),
     username: str = Depends(get_admin_credentials)
 ):
-    """Upload multiple terms via CSV or JSON file"""
+    """Upload multiple terms via CSV or JSON file
+
+    dry_run=true returns the diff against the existing corpus without writing.
+    mode=upsert inserts new rows and updates only rows whose content changed.
+    """
     logger.info(f"Received file upload: {file.filename}")
+
+    if mode not in ('insert', 'upsert'):
+        raise HTTPException(
+            status_code=400,
+            detail="mode must be 'insert' or 'upsert'"
+        )
     
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
@@ -213,8 +344,20 @@ async def upload_terms(
                 detail="File contains no valid terms"
             )
 
+        if dry_run:
+            diff = await database.diff_upload_terms(terms)
+            return {
+                "message": f"Dry run for {len(terms)} terms",
+                "status": "dry_run",
+                "diff": diff
+            }
+
         # Process terms immediately instead of background
-        results = await database.bulk_create_terms(terms)
+        if mode == 'upsert':
+            results = await database.upsert_terms(terms)
+        else:
+            results = await database.bulk_create_terms(terms)
+        bundle.schedule_rebuild()
         
         return {
             "message": f"Processed {len(terms)} terms",
@@ -244,6 +387,8 @@ async def upload_terms(
 async def cleanup_duplicates(username: str = Depends(get_admin_credentials)):
     """Remove duplicate terms from the database"""
     count = await database.cleanup_duplicates()
+    if count:
+        bundle.schedule_rebuild()
     return {
         "message": f"Removed {count} duplicate terms",
         "status": "completed"
@@ -268,6 +413,7 @@ async def bulk_delete_terms(
         
         # Delete the terms
         deleted = await database.bulk_delete_terms(request.term_ids)
+        bundle.schedule_rebuild()
         
         return {
             "message": f"Successfully deleted {deleted} terms",
@@ -280,6 +426,37 @@ async def bulk_delete_terms(
             detail=f"Failed to delete terms: {str(e)}"
         )
 
+class BulkUpdateRequest(BaseModel):
+    updates: list[models_mongo.TermUpdate] = []
+    recategorize: list[models_mongo.CategoryReassign] = []
+
+@app.patch("/admin/terms")
+async def bulk_update_terms(
+    request: BulkUpdateRequest,
+    username: str = Depends(get_admin_credentials)
+):
+    """Apply partial updates and category reassignments to many terms at once"""
+    if not request.updates and not request.recategorize:
+        raise HTTPException(status_code=400, detail="No updates provided")
+
+    try:
+        results = await database.bulk_update_terms(
+            [update.model_dump() for update in request.updates],
+            [reassign.model_dump() for reassign in request.recategorize]
+        )
+        if results["modified"]:
+            bundle.schedule_rebuild()
+        return {
+            "message": f"Updated {results['modified']} terms",
+            **results
+        }
+    except Exception as e:
+        logger.error(f"Bulk update error: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to update terms: {str(e)}"
+        )
+
 @app.delete("/admin/delete-all")
 async def delete_all_terms(
     confirmation: str,
@@ -294,6 +471,7 @@ async def delete_all_terms(
     
     try:
         count = await database.delete_all_terms()
+        bundle.schedule_rebuild()
         return {
             "message": f"Successfully deleted all {count} terms",
             "deleted_count": count
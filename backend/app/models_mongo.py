@@ -40,4 +40,26 @@ class Term(TermBase):
     id: str
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class TermUpdate(BaseModel):
+    id: str
+    term: Optional[str] = Field(None, min_length=1, max_length=100)
+    definition: Optional[str] = Field(None, min_length=10)
+    category: Optional[str] = Field(None, min_length=2)
+
+    @field_validator('term', 'definition', 'category')
+    def validate_not_blank(cls, v):
+        if v is not None and not v.strip():
+            raise ValueError('Field cannot be empty')
+        return v.strip() if v is not None else v
+
+class CategoryReassign(BaseModel):
+    from_category: str = Field(..., min_length=2)
+    to_category: str = Field(..., min_length=2)
+
+    @field_validator('from_category', 'to_category')
+    def validate_category(cls, v):
+        if not v.strip():
+            raise ValueError('Category cannot be empty')
+        return v.strip()
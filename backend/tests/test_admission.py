@@ -0,0 +1,49 @@
+import asyncio
+
+from app.admission import QUEUE_FULL, TIMEOUT, Overloaded, RouteLimiter
+
+def test_same_tick_burst_respects_queue_bound():
+    async def burst():
+        limiter = RouteLimiter("search", concurrency=2, max_queue=2, timeout=5.0)
+        release = asyncio.Event()
+        reasons = []
+
+        async def request():
+            try:
+                await limiter.acquire()
+            except Overloaded as e:
+                reasons.append(e.reason)
+                return "rejected"
+            await release.wait()
+            limiter.release()
+            return "admitted"
+
+        # All eight calls start in the same loop tick
+        pending = asyncio.gather(*(request() for _ in range(8)))
+        await asyncio.sleep(0)
+        assert limiter.in_flight == 2
+        assert limiter.waiting == 2
+        release.set()
+        return await pending, reasons, limiter
+
+    results, reasons, limiter = asyncio.run(burst())
+    assert results.count("admitted") == 4
+    assert results.count("rejected") == 4
+    assert reasons == [QUEUE_FULL] * 4
+    assert limiter.rejected_queue_full == 4
+    assert limiter.in_flight == 0
+
+def test_wait_past_deadline_is_rejected_as_timeout():
+    async def wait_for_busy_slot():
+        limiter = RouteLimiter("admin", concurrency=1, max_queue=1, timeout=0.05)
+        await limiter.acquire()
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            return e.reason, limiter
+        return None, limiter
+
+    reason, limiter = asyncio.run(wait_for_busy_slot())
+    assert reason == TIMEOUT
+    assert limiter.rejected_timeout == 1
+    assert limiter.waiting == 0